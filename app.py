@@ -3,6 +3,8 @@ from routes.main import main
 from routes.wiki import wiki
 from routes.settings import settings
 from routes.proxy import proxy
+from core.render import format_iso_time, format_relative_time
+from core.upstream import UpstreamUnavailable
 
 app = Flask(__name__)
 
@@ -11,11 +13,20 @@ app.register_blueprint(wiki)
 app.register_blueprint(settings)
 app.register_blueprint(proxy)
 
+# relative times are formatted at render time so parsed data never goes stale
+app.add_template_filter(format_relative_time, "reltime")
+app.add_template_filter(format_iso_time, "isotime")
+
 
 @app.errorhandler(404)
 def not_found(error):
     return render_template('404.html'), 404
 
 
+@app.errorhandler(UpstreamUnavailable)
+def upstream_unavailable(error):
+    return "Reddit is not responding right now, try again shortly", 503
+
+
 if __name__ == "__main__":
     app.run(debug=True)
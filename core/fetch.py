@@ -1,28 +1,15 @@
+import heapq
+import re
 import requests
-import time
-from typing import Optional, Dict, Any, List
-
-
-def format_relative_time(timestamp: float) -> str:
-    """Convert UTC timestamp to relative time string (e.g. '5h ago')."""
-    if not timestamp:
-        return ""
-    diff = time.time() - timestamp
-    if diff < 60:
-        return "just now"
-    if diff < 3600:
-        return f"{int(diff // 60)}m ago"
-    if diff < 86400:
-        return f"{int(diff // 3600)}h ago"
-    if diff < 2592000:
-        return f"{int(diff // 86400)}d ago"
-    if diff < 31536000:
-        return f"{int(diff // 2592000)}mo ago"
-    return f"{int(diff // 31536000)}y ago"
+from core import upstream
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
 
 
 BASE_URL = "https://www.reddit.com"
 HEADERS = {"User-Agent": "linux:client"}
+# total time budget for a thread page, including morechildren follow-ups
+POST_DEADLINE = 15.0
 
 
 def _extract_reddit_video_urls(d: Dict[str, Any]) -> Dict[str, Optional[str]]:
@@ -100,7 +87,6 @@ def parse_post(d: Dict[str, Any], brief_len: int = 150) -> Dict[str, Any]:
         "video_mp4": video["video_mp4"],
         "video_hls": video["video_hls"],
         "subreddit_icon": video["subreddit_icon"],
-        "created_rel": format_relative_time(d.get("created_utc")),  # pyright: ignore
     }
 
 
@@ -116,7 +102,7 @@ def fetch_wiki_page(subreddit: str, page: str = "index") -> Dict[str, Any]:
     """
     url = f"{BASE_URL}/r/{subreddit}/wiki/{page}"
     try:
-        r = requests.get(url, headers=HEADERS, timeout=10)
+        r = upstream.request("GET", url, "wiki", headers=HEADERS)
         r.raise_for_status()
     except requests.HTTPError as e:
         if e.response.status_code == 404:
@@ -177,7 +163,7 @@ def fetch_wiki_pages(subreddit: str) -> Dict[str, Any]:
     url = f"{BASE_URL}/r/{subreddit}/wiki/pages"
     params = {"raw_json": 1}
     try:
-        r = requests.get(url, headers=HEADERS, params=params, timeout=10)
+        r = upstream.request("GET", url, "wiki_pages", headers=HEADERS, params=params)
         r.raise_for_status()
     except requests.HTTPError as e:
         if e.response.status_code == 404:
@@ -198,6 +184,8 @@ def fetch_posts(
     username: Optional[str] = None,
     after: Optional[str] = None,
     disable_nsfw: bool = False,
+    sort: Optional[str] = None,
+    deadline: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     Fetch posts from a subreddit or user.
@@ -207,11 +195,16 @@ def fetch_posts(
         url = f"{BASE_URL}/user/{username}/submitted.json"
     else:
         subreddit = subreddit or "popular"
-        url = f"{BASE_URL}/r/{subreddit}.json"
+        if sort:
+            url = f"{BASE_URL}/r/{subreddit}/{sort}.json"
+        else:
+            url = f"{BASE_URL}/r/{subreddit}.json"
 
     params = {"after": after, "sr_detail": 1} if after else {"sr_detail": 1}
     try:
-        r = requests.get(url, headers=HEADERS, params=params, timeout=10)
+        r = upstream.request(
+            "GET", url, "listing", deadline=deadline, headers=HEADERS, params=params
+        )
         r.raise_for_status()
     except requests.HTTPError as e:
         if e.response.status_code == 404:
@@ -234,6 +227,123 @@ def fetch_posts(
     }
 
 
+_FULLNAME_RE = re.compile(r"^t3_[a-z0-9]+$")
+
+FEED_SORTS = {
+    # feed sort -> (subreddit listing, merge key)
+    "new": ("new", "created_utc"),
+    "top": ("top", "score"),
+}
+FEED_PAGE_SIZE = 25
+# every source is fetched at once, so this is also the thread count per page
+FEED_MAX_SUBREDDITS = 15
+# a source slower than this is skipped for the page
+FEED_DEADLINE = 5.0
+
+
+def parse_feed_cursor(cursor: Optional[str]) -> Dict[str, Optional[str]]:
+    """Decode a composite feed cursor ("sub:t3_abc,sub2:t3_def").
+
+    Positions that are not post fullnames are reset to the first page.
+    """
+    out: Dict[str, Optional[str]] = {}
+    for part in (cursor or "").split(","):
+        name, _, after = part.partition(":")
+        if name:
+            out[name] = after if _FULLNAME_RE.match(after) else None
+    return out
+
+
+def format_feed_cursor(cursors: Dict[str, Optional[str]]) -> str:
+    return ",".join(f"{name}:{after or ''}" for name, after in cursors.items())
+
+
+def fetch_feed(
+    subreddits: List[str],
+    after: Optional[str] = None,
+    disable_nsfw: bool = False,
+    sort: str = "new",
+) -> Dict[str, Any]:
+    """Fetch several subreddits concurrently and merge them into one listing.
+
+    Each source keeps its own position in the composite `after` cursor, so
+    the next page resumes every subreddit right after the last post of it
+    that was shown.
+    """
+    listing, key = FEED_SORTS.get(sort, FEED_SORTS["new"])
+    subreddits = subreddits[:FEED_MAX_SUBREDDITS]
+
+    # sources missing from the cursor were exhausted on an earlier page
+    cursors = parse_feed_cursor(after)
+    cursors = {s: cursors[s] for s in subreddits if s in cursors}
+    if not cursors:
+        # no cursor, or one naming none of these subreddits: start over
+        cursors = {s: None for s in subreddits}
+
+    if not cursors:
+        return {"posts": [], "after": None, "before": None}
+
+    deadline = upstream.deadline_in(FEED_DEADLINE)
+
+    def _fetch(name: str) -> Dict[str, Any]:
+        try:
+            return fetch_posts(
+                subreddit=name,
+                after=cursors[name],
+                disable_nsfw=disable_nsfw,
+                sort=listing,
+                deadline=deadline,
+            )
+        except (requests.RequestException, ValueError, KeyError):
+            # private/banned/unknown subreddit, odd response or upstream
+            # trouble: skip it this page
+            return {"posts": [], "after": None, "error": "unavailable"}
+
+    with ThreadPoolExecutor(max_workers=len(cursors)) as pool:
+        results = dict(zip(cursors, pool.map(_fetch, cursors)))
+
+    if all(data.get("error") == "unavailable" for data in results.values()):
+        raise upstream.UpstreamUnavailable("no feed source could be fetched")
+
+    def _entries(name: str) -> List[Tuple[float, str, Dict[str, Any]]]:
+        return [(-(p.get(key) or 0), name, p) for p in results[name]["posts"]]
+
+    merged = heapq.merge(*(_entries(name) for name in cursors), key=lambda e: e[0])
+
+    posts: List[Dict[str, Any]] = []
+    taken: Dict[str, int] = {name: 0 for name in cursors}
+    for _, name, post in merged:
+        if len(posts) >= FEED_PAGE_SIZE:
+            break
+        posts.append(post)
+        taken[name] += 1
+
+    # merge keeps per-source order, so each source contributed a prefix
+    next_cursors: Dict[str, Optional[str]] = {}
+    for name, data in results.items():
+        source_posts = data["posts"]
+        if data.get("error") == "unavailable":
+            # retry from the same position on the next page
+            next_cursors[name] = cursors[name]
+        elif taken[name] == len(source_posts):
+            if data.get("after"):
+                next_cursors[name] = data["after"]
+        elif taken[name]:
+            next_cursors[name] = source_posts[taken[name] - 1]["fullname"]
+        else:
+            next_cursors[name] = cursors[name]
+
+    if all(results[name].get("error") == "unavailable" for name in next_cursors):
+        # only failing sources are left; end the feed rather than loop on them
+        next_cursors = {}
+
+    return {
+        "posts": posts,
+        "after": format_feed_cursor(next_cursors) if next_cursors else None,
+        "before": None,
+    }
+
+
 def fetch_post_by_id(
     post_id: str,
     expand_more_children: Optional[List[str]] = None,
@@ -256,17 +366,16 @@ def fetch_post_by_id(
             "body": data.get("body") or "",
             "score": data.get("score"),
             "created_utc": data.get("created_utc"),
-            "created_rel": format_relative_time(data.get("created_utc")),  # pyright: ignore
             "children": [],
         }
 
     def _collect_from_listing(
         children: List[Dict[str, Any]],
         expand_ids: set[str],
-    ) -> tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], List[str]]:
+    ) -> tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
         by_fullname: Dict[str, Dict[str, Any]] = {}
         more_nodes: List[Dict[str, Any]] = []
-        to_expand: List[str] = []
+        to_expand: List[Dict[str, Any]] = []
 
         def walk(items: List[Dict[str, Any]]) -> None:
             for item in items:
@@ -286,25 +395,26 @@ def fetch_post_by_id(
                         kid_ids = [k for k in kids if isinstance(k, str)]
                         parent_fullname = data.get("parent_id")
 
+                        node = {
+                            "type": "more",
+                            "parent_fullname": parent_fullname,
+                            "children": kid_ids,
+                        }
                         if expand_ids and all(k in expand_ids for k in kid_ids):
-                            to_expand.extend(kid_ids)
+                            to_expand.append(node)
                         else:
-                            more_nodes.append(
-                                {
-                                    "type": "more",
-                                    "parent_fullname": parent_fullname,
-                                    "children": kid_ids,
-                                }
-                            )
+                            more_nodes.append(node)
 
         walk(children)
         return by_fullname, more_nodes, to_expand
 
     def _fetch_morechildren(
-        link_fullname: str, children: List[str]
-    ) -> List[Dict[str, Any]]:
+        link_fullname: str, children: List[str], deadline: float
+    ) -> tuple[List[Dict[str, Any]], List[str]]:
+        """Return the fetched things and any child IDs left over when the
+        deadline ran out."""
         if not children:
-            return []
+            return [], []
 
         url = f"{BASE_URL}/api/morechildren.json"
         out: List[Dict[str, Any]] = []
@@ -319,8 +429,17 @@ def fetch_post_by_id(
                 "raw_json": 1,
             }
             try:
-                r = requests.post(url, headers=HEADERS, data=payload, timeout=10)
+                r = upstream.request(
+                    "POST",
+                    url,
+                    "morechildren",
+                    deadline=deadline,
+                    headers=HEADERS,
+                    data=payload,
+                )
                 r.raise_for_status()
+            except upstream.UpstreamUnavailable:
+                return out, children[i:]
             except requests.HTTPError as e:
                 if e.response.status_code == 404:
                     continue
@@ -330,7 +449,7 @@ def fetch_post_by_id(
             if isinstance(things, list):
                 out.extend([t for t in things if isinstance(t, dict)])
 
-        return out
+        return out, []
 
     def _build_tree(
         link_fullname: str,
@@ -362,8 +481,11 @@ def fetch_post_by_id(
 
     url = f"{BASE_URL}/comments/{post_id}.json"
     params = {"limit": 500, "depth": 10, "raw_json": 1, "sr_detail": 1}
+    deadline = upstream.deadline_in(POST_DEADLINE)
     try:
-        r = requests.get(url, headers=HEADERS, params=params, timeout=10)
+        r = upstream.request(
+            "GET", url, "comments", deadline=deadline, headers=HEADERS, params=params
+        )
         r.raise_for_status()
     except requests.HTTPError as e:
         if e.response.status_code == 404:
@@ -381,10 +503,18 @@ def fetch_post_by_id(
     link_fullname = post_data.get("name") or f"t3_{post_id}"
 
     if to_expand:
-        things = _fetch_morechildren(link_fullname, to_expand)
+        expand_children = [k for m in to_expand for k in m["children"]]
+        things, leftover = _fetch_morechildren(link_fullname, expand_children, deadline)
         new_by_fullname, new_more_nodes, _ = _collect_from_listing(things, set())
         by_fullname.update(new_by_fullname)
         more_nodes.extend(new_more_nodes)
+        if leftover:
+            # out of time; keep the unfetched ones loadable under their parents
+            left = set(leftover)
+            for m in to_expand:
+                kids = [k for k in m["children"] if k in left]
+                if kids:
+                    more_nodes.append({**m, "children": kids})
 
     post = parse_post(post_data)
     post["comments"] = _build_tree(link_fullname, by_fullname, more_nodes)
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import re
-from typing import Any, Dict
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
 
 import bleach  # pyright: ignore
 import markdown
@@ -71,6 +73,31 @@ def _embed_reddit_image_links(text: str) -> str:
     return _REDDIT_IMAGE_URL_RE.sub(repl, text)
 
 
+def format_relative_time(timestamp: Optional[float]) -> str:
+    """Convert UTC timestamp to relative time string (e.g. '5h ago')."""
+    if not timestamp:
+        return ""
+    diff = time.time() - timestamp
+    if diff < 60:
+        return "just now"
+    if diff < 3600:
+        return f"{int(diff // 60)}m ago"
+    if diff < 86400:
+        return f"{int(diff // 3600)}h ago"
+    if diff < 2592000:
+        return f"{int(diff // 86400)}d ago"
+    if diff < 31536000:
+        return f"{int(diff // 2592000)}mo ago"
+    return f"{int(diff // 31536000)}y ago"
+
+
+def format_iso_time(timestamp: Optional[float]) -> str:
+    """Convert UTC timestamp to ISO 8601, for <time datetime="...">."""
+    if not timestamp:
+        return ""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
 def render_markdown(text: str) -> str:
     if not text:
         return ""
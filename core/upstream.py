@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+
+
+DEFAULT_TIMEOUT = 10.0
+
+# latency samples kept per endpoint, and how many are needed before hedging
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+# never hedge sooner than this, even if p95 is tiny
+HEDGE_MIN_DELAY = 0.05
+# each request earns this fraction of a hedge, so at most ~10% extra traffic
+HEDGE_BUDGET_RATIO = 0.1
+HEDGE_BUDGET_MAX = 10.0
+
+BREAKER_FAILURES = 5
+BREAKER_COOLDOWN = 30.0
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """Raised when upstream is unreachable, the circuit for a host is open or
+    the deadline ran out."""
+
+
+class _LatencyTracker:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, endpoint: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW))
+            samples.append(seconds)
+
+    def p95(self, endpoint: str) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+
+class _CircuitBreaker:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+
+    def allow(self, host: str) -> bool:
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return True
+            if time.monotonic() - opened_at >= BREAKER_COOLDOWN:
+                # half-open: let one probe through, re-open if it fails
+                self._opened_at[host] = time.monotonic()
+                return True
+            return False
+
+    def success(self, host: str) -> None:
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+
+    def failure(self, host: str) -> None:
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if self._failures[host] >= BREAKER_FAILURES:
+                self._opened_at[host] = time.monotonic()
+
+
+class _HedgeBudget:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tokens = HEDGE_BUDGET_MAX
+
+    def earn(self) -> None:
+        with self._lock:
+            self._tokens = min(self._tokens + HEDGE_BUDGET_RATIO, HEDGE_BUDGET_MAX)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+_latency = _LatencyTracker()
+_breaker = _CircuitBreaker()
+_budget = _HedgeBudget()
+
+
+def deadline_in(seconds: float) -> float:
+    """Return a deadline usable with request(), `seconds` from now."""
+    return time.monotonic() + seconds
+
+
+def _is_failure(r: requests.Response) -> bool:
+    return r.status_code >= 500 or r.status_code == 429
+
+
+def _attempt(
+    method: str, url: str, endpoint: str, timeout: float, **kwargs: Any
+) -> requests.Response:
+    start = time.monotonic()
+    try:
+        r = requests.request(method, url, timeout=timeout, **kwargs)
+    except (requests.Timeout, requests.ConnectionError) as e:
+        raise UpstreamUnavailable(f"{urlsplit(url).netloc} did not respond") from e
+    if not _is_failure(r):
+        _latency.record(endpoint, time.monotonic() - start)
+    return r
+
+
+class _Race:
+    """Runs attempts on their own threads and keeps the first good answer.
+
+    Attempts do not share a bounded pool, so a burst of requests can never
+    leave an attempt queued behind others while its caller waits on it.
+    """
+
+    def __init__(self, method: str, url: str, endpoint: str, kwargs: Dict[str, Any]):
+        self._args = (method, url, endpoint)
+        self._kwargs = kwargs
+        self._cond = threading.Condition()
+        self._launched = 0
+        self._outcomes: List[Union[requests.Response, requests.RequestException]] = []
+
+    def launch(self, timeout: float) -> None:
+        with self._cond:
+            self._launched += 1
+        threading.Thread(target=self._run, args=(timeout,), daemon=True).start()
+
+    def _run(self, timeout: float) -> None:
+        outcome: Union[requests.Response, requests.RequestException]
+        try:
+            outcome = _attempt(*self._args, timeout, **self._kwargs)
+        except requests.RequestException as e:
+            outcome = e
+        with self._cond:
+            self._outcomes.append(outcome)
+            self._cond.notify_all()
+
+    def _winner(self) -> Optional[requests.Response]:
+        for o in self._outcomes:
+            if not isinstance(o, requests.RequestException) and not _is_failure(o):
+                return o
+        return None
+
+    def wait(self, until: float) -> bool:
+        """Wait until an attempt succeeds, all attempts finish, or `until`.
+
+        Returns True when there is nothing left to wait for.
+        """
+        with self._cond:
+            return self._cond.wait_for(
+                lambda: self._winner() is not None
+                or len(self._outcomes) == self._launched,
+                timeout=max(until - time.monotonic(), 0),
+            )
+
+    def result(self) -> requests.Response:
+        with self._cond:
+            winner = self._winner()
+            if winner is not None:
+                return winner
+            # prefer an upstream error response over an exception
+            errors = []
+            for o in self._outcomes:
+                if not isinstance(o, requests.RequestException):
+                    return o
+                errors.append(o)
+            if errors:
+                raise errors[0]
+        raise UpstreamUnavailable("deadline exceeded")
+
+
+def request(
+    method: str,
+    url: str,
+    endpoint: str,
+    deadline: Optional[float] = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """Send a request to upstream with hedging and a per-host circuit breaker.
+
+    If the first attempt is slower than the endpoint's observed p95, a second
+    identical attempt is sent and whichever answers successfully first wins.
+    Hedges are rate limited to a fraction of all requests. Only use this for
+    requests that are safe to send twice.
+
+    Raises UpstreamUnavailable when the host's circuit is open, the host times
+    out or refuses the connection, or `deadline` (a time.monotonic() value)
+    has already passed.
+    """
+    host = urlsplit(url).netloc
+    if not _breaker.allow(host):
+        raise UpstreamUnavailable(f"{host} is unavailable")
+
+    timeout = DEFAULT_TIMEOUT
+    if deadline is not None:
+        timeout = min(timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            raise UpstreamUnavailable("deadline exceeded")
+
+    _budget.earn()
+    # one breaker outcome per call, however many attempts it took
+    try:
+        r = _send(method, url, endpoint, timeout, kwargs)
+    except requests.RequestException:
+        _breaker.failure(host)
+        raise
+    if _is_failure(r):
+        _breaker.failure(host)
+    else:
+        _breaker.success(host)
+    return r
+
+
+def _send(
+    method: str, url: str, endpoint: str, timeout: float, kwargs: Dict[str, Any]
+) -> requests.Response:
+    p95 = _latency.p95(endpoint)
+    if p95 is None or max(p95, HEDGE_MIN_DELAY) >= timeout:
+        return _attempt(method, url, endpoint, timeout, **kwargs)
+
+    started = time.monotonic()
+    ends_at = started + timeout
+    race = _Race(method, url, endpoint, kwargs)
+    race.launch(timeout)
+    if not race.wait(started + max(p95, HEDGE_MIN_DELAY)) and _budget.spend():
+        race.launch(ends_at - time.monotonic())
+    race.wait(ends_at)
+    return race.result()
@@ -1,9 +1,10 @@
 from flask import Blueprint, render_template, request, redirect  # pyright: ignore
-from core.fetch import fetch_posts, fetch_post_by_id
+from core.fetch import FEED_SORTS, fetch_feed, fetch_posts, fetch_post_by_id
 from core.render import (
     enrich_listing_with_rendered_fields,
     enrich_post_with_rendered_fields,
 )
+from routes.settings import get_feed_subreddits
 import requests
 
 main = Blueprint("main", __name__)
@@ -27,6 +28,21 @@ def subreddit_page(subreddit):
     return render_template("index.html", subreddit=subreddit, **data)
 
 
+@main.route("/feed")
+def feed_page():
+    after = request.args.get("after")
+    sort = request.args.get("sort", "new")
+    if sort not in FEED_SORTS:
+        sort = "new"
+    disable_nsfw = request.cookies.get("disable_nsfw", "0") == "1"
+    subreddits = get_feed_subreddits()
+    if not subreddits:
+        return redirect("/settings")
+    data = fetch_feed(subreddits, after=after, disable_nsfw=disable_nsfw, sort=sort)
+    enrich_listing_with_rendered_fields(data)
+    return render_template("index.html", feed=True, sort=sort, **data)
+
+
 @main.route("/r/<subreddit>/")
 def subreddit_page_slash(subreddit: str):
     return redirect(f"/r/{subreddit}", code=301)
@@ -1,17 +1,49 @@
 from flask import Blueprint, render_template, request, redirect  # pyright: ignore
+from core.fetch import FEED_MAX_SUBREDDITS
+import re
 
 settings = Blueprint("settings", __name__)
 
+_SUBREDDIT_RE = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def parse_subreddit_list(value: str) -> list[str]:
+    """Split a comma/space separated list of subreddits, dropping junk and dupes.
+
+    At most FEED_MAX_SUBREDDITS names are kept.
+    """
+    out: list[str] = []
+    for name in re.split(r"[\s,+]+", value or ""):
+        name = name.strip().removeprefix("r/").removeprefix("/r/")
+        if name and _SUBREDDIT_RE.match(name) and name not in out:
+            out.append(name)
+            if len(out) >= FEED_MAX_SUBREDDITS:
+                break
+    return out
+
+
+def get_feed_subreddits() -> list[str]:
+    return parse_subreddit_list(request.cookies.get("feed_subreddits", ""))
+
 
 @settings.route("/settings", methods=["GET", "POST"])
 def settings_page():
     if request.method == "POST":
         disable_nsfw = request.form.get("disable_nsfw") == "on"
+        feed_subreddits = parse_subreddit_list(request.form.get("feed_subreddits", ""))
         response = redirect("/settings")
         response.set_cookie(
             "disable_nsfw", "1" if disable_nsfw else "0", max_age=31536000
         )
+        response.set_cookie(
+            "feed_subreddits", ",".join(feed_subreddits), max_age=31536000
+        )
         return response
 
     disable_nsfw = request.cookies.get("disable_nsfw", "0") == "1"
-    return render_template("settings.html", disable_nsfw=disable_nsfw)
+    return render_template(
+        "settings.html",
+        disable_nsfw=disable_nsfw,
+        feed_subreddits=get_feed_subreddits(),
+        feed_max=FEED_MAX_SUBREDDITS,
+    )
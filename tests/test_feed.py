@@ -0,0 +1,153 @@
+import pytest
+import requests
+
+from core import fetch, upstream
+
+
+class FakeSubreddits:
+    """Stands in for fetch_posts, paging through canned listings."""
+
+    def __init__(self, listings, page_size=3):
+        # name -> list of (fullname, created_utc)
+        self.listings = listings
+        self.page_size = page_size
+        self.failing = {}
+        self.calls = []
+
+    def __call__(self, subreddit, after, disable_nsfw, sort, deadline):
+        self.calls.append((subreddit, after))
+        if subreddit in self.failing:
+            raise self.failing[subreddit]
+        items = self.listings[subreddit]
+        start = 0
+        if after:
+            start = [n for n, _ in items].index(after) + 1
+        page = items[start : start + self.page_size]
+        more = start + self.page_size < len(items)
+        posts = [{"fullname": n, "created_utc": c, "score": c} for n, c in page]
+        if disable_nsfw:
+            posts = [p for p in posts if not p["fullname"].endswith("nsfw")]
+        return {
+            "posts": posts,
+            "after": page[-1][0] if more else None,
+            "before": None,
+        }
+
+
+def listing(prefix, times):
+    return [(f"t3_{prefix}{i}", t) for i, t in enumerate(times)]
+
+
+@pytest.fixture
+def subs(monkeypatch):
+    fake = FakeSubreddits(
+        {
+            "a": listing("a", [100, 97, 94, 91, 88]),
+            "b": listing("b", [99, 98, 96, 95, 60]),
+        }
+    )
+    monkeypatch.setattr(fetch, "fetch_posts", fake)
+    monkeypatch.setattr(fetch, "FEED_PAGE_SIZE", 4)
+    return fake
+
+
+def names(data):
+    return [p["fullname"] for p in data["posts"]]
+
+
+def test_cursor_round_trip():
+    cursors = {"a": "t3_a1", "b": None}
+    assert fetch.parse_feed_cursor(fetch.format_feed_cursor(cursors)) == cursors
+
+
+def test_cursor_resets_junk_positions():
+    assert fetch.parse_feed_cursor("a:<script>,b:t3_b2,,:t3_x,c") == {
+        "a": None,
+        "b": "t3_b2",
+        "c": None,
+    }
+
+
+def test_merges_by_recency_and_keeps_each_source_position(subs):
+    data = fetch.fetch_feed(["a", "b"])
+    assert names(data) == ["t3_a0", "t3_b0", "t3_b1", "t3_a1"]
+    assert fetch.parse_feed_cursor(data["after"]) == {"a": "t3_a1", "b": "t3_b1"}
+
+
+def test_top_sort_merges_by_score(subs):
+    data = fetch.fetch_feed(["a", "b"], sort="top")
+    assert names(data) == ["t3_a0", "t3_b0", "t3_b1", "t3_a1"]
+
+
+def test_consecutive_pages_cover_every_post_once(subs):
+    seen = []
+    after = None
+    for _ in range(10):
+        data = fetch.fetch_feed(["a", "b"], after=after)
+        seen.extend(names(data))
+        after = data["after"]
+        if not after:
+            break
+    assert after is None
+    assert sorted(seen) == sorted(n for items in subs.listings.values() for n, _ in items)
+    assert len(seen) == len(set(seen))
+
+
+def test_source_running_out_mid_page_is_dropped(subs):
+    subs.listings["b"] = listing("b", [99])
+    data = fetch.fetch_feed(["a", "b"])
+    assert names(data) == ["t3_a0", "t3_b0", "t3_a1", "t3_a2"]
+    # b had no more pages, a used up its whole page and continues from it
+    assert fetch.parse_feed_cursor(data["after"]) == {"a": "t3_a2"}
+
+    data = fetch.fetch_feed(["a", "b"], after=data["after"])
+    assert names(data) == ["t3_a3", "t3_a4"]
+    assert data["after"] is None
+    assert subs.calls[2:] == [("a", "t3_a2")]
+
+
+def test_failing_source_is_retried_from_same_position(subs):
+    subs.failing["b"] = requests.HTTPError("403")
+    data = fetch.fetch_feed(["a", "b"], after="a:t3_a0,b:t3_b1")
+    assert names(data) == ["t3_a1", "t3_a2", "t3_a3"]
+    assert fetch.parse_feed_cursor(data["after"]) == {"a": "t3_a3", "b": "t3_b1"}
+
+
+@pytest.mark.parametrize("error", [ValueError("not json"), KeyError("id")])
+def test_malformed_source_is_skipped(subs, error):
+    subs.failing["b"] = error
+    data = fetch.fetch_feed(["a", "b"])
+    assert names(data) == ["t3_a0", "t3_a1", "t3_a2"]
+
+
+def test_feed_ends_when_only_failing_sources_remain(subs):
+    subs.failing["b"] = requests.HTTPError("403")
+    data = fetch.fetch_feed(["a", "b"], after="a:t3_a2,b:")
+    assert names(data) == ["t3_a3", "t3_a4"]
+    assert data["after"] is None
+
+
+def test_all_sources_failing_raises(subs):
+    subs.failing["a"] = upstream.UpstreamUnavailable("open")
+    subs.failing["b"] = upstream.UpstreamUnavailable("open")
+    with pytest.raises(upstream.UpstreamUnavailable):
+        fetch.fetch_feed(["a", "b"])
+
+
+def test_nsfw_filtered_posts_are_skipped_past(subs):
+    subs.listings["b"] = [("t3_b0", 99), ("t3_b1nsfw", 98), ("t3_b2", 10)]
+    data = fetch.fetch_feed(["a", "b"], disable_nsfw=True)
+    assert names(data) == ["t3_a0", "t3_b0", "t3_a1", "t3_a2"]
+    # b's page is not fully used, so it resumes after the last shown post
+    assert fetch.parse_feed_cursor(data["after"])["b"] == "t3_b0"
+
+
+def test_unknown_cursor_starts_over(subs):
+    data = fetch.fetch_feed(["a", "b"], after="gone:t3_zz")
+    assert names(data) == ["t3_a0", "t3_b0", "t3_b1", "t3_a1"]
+
+
+def test_cursor_ignores_subreddits_no_longer_in_settings(subs):
+    data = fetch.fetch_feed(["a"], after="a:t3_a0,b:t3_b0")
+    assert names(data) == ["t3_a1", "t3_a2", "t3_a3"]
+    assert [name for name, _ in subs.calls] == ["a"]
@@ -0,0 +1,218 @@
+import threading
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+from core import upstream
+
+
+HOST = "www.reddit.com"
+URL = f"https://{HOST}/r/python.json"
+
+
+class FakeResponse:
+    def __init__(self, status_code: int = 200) -> None:
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(upstream, "_latency", upstream._LatencyTracker())
+    monkeypatch.setattr(upstream, "_breaker", upstream._CircuitBreaker())
+    monkeypatch.setattr(upstream, "_budget", upstream._HedgeBudget())
+
+
+def test_p95_needs_enough_samples():
+    tracker = upstream._LatencyTracker()
+    for _ in range(upstream.LATENCY_MIN_SAMPLES - 1):
+        tracker.record("listing", 0.1)
+    assert tracker.p95("listing") is None
+
+    tracker.record("listing", 0.1)
+    assert tracker.p95("listing") == 0.1
+
+
+def test_p95_ignores_the_slowest_five_percent():
+    tracker = upstream._LatencyTracker()
+    for i in range(1, 101):
+        tracker.record("listing", i / 100)
+    assert tracker.p95("listing") == 0.95
+    assert tracker.p95("comments") is None
+
+
+def test_breaker_opens_after_repeated_failures():
+    breaker = upstream._CircuitBreaker()
+    for _ in range(upstream.BREAKER_FAILURES - 1):
+        breaker.failure(HOST)
+    assert breaker.allow(HOST)
+
+    breaker.failure(HOST)
+    assert not breaker.allow(HOST)
+    assert breaker.allow("other.host")
+
+
+def test_breaker_half_opens_after_cooldown_and_closes_on_success():
+    breaker = upstream._CircuitBreaker()
+    now = time.monotonic()
+    with mock.patch.object(upstream.time, "monotonic", return_value=now):
+        for _ in range(upstream.BREAKER_FAILURES):
+            breaker.failure(HOST)
+    assert not breaker.allow(HOST)
+
+    later = now + upstream.BREAKER_COOLDOWN
+    with mock.patch.object(upstream.time, "monotonic", return_value=later):
+        # one probe is let through, the next caller still fails fast
+        assert breaker.allow(HOST)
+        assert not breaker.allow(HOST)
+
+    breaker.success(HOST)
+    assert breaker.allow(HOST)
+
+
+def test_breaker_reopens_when_probe_fails():
+    breaker = upstream._CircuitBreaker()
+    now = time.monotonic()
+    with mock.patch.object(upstream.time, "monotonic", return_value=now):
+        for _ in range(upstream.BREAKER_FAILURES):
+            breaker.failure(HOST)
+
+    later = now + upstream.BREAKER_COOLDOWN
+    with mock.patch.object(upstream.time, "monotonic", return_value=later):
+        assert breaker.allow(HOST)
+        breaker.failure(HOST)
+        assert not breaker.allow(HOST)
+
+
+def test_request_fails_fast_once_breaker_is_open():
+    fake = mock.Mock(side_effect=requests.ConnectTimeout())
+    with mock.patch("requests.request", fake):
+        for _ in range(upstream.BREAKER_FAILURES):
+            with pytest.raises(upstream.UpstreamUnavailable):
+                upstream.request("GET", URL, "listing")
+        with pytest.raises(upstream.UpstreamUnavailable):
+            upstream.request("GET", URL, "listing")
+    assert fake.call_count == upstream.BREAKER_FAILURES
+
+
+def test_request_converts_timeouts():
+    with mock.patch("requests.request", side_effect=requests.ReadTimeout()):
+        with pytest.raises(upstream.UpstreamUnavailable) as exc:
+            upstream.request("GET", URL, "listing")
+    assert isinstance(exc.value.__cause__, requests.ReadTimeout)
+
+
+def test_request_respects_deadline():
+    with mock.patch("requests.request") as fake:
+        with pytest.raises(upstream.UpstreamUnavailable):
+            upstream.request("GET", URL, "listing", deadline=time.monotonic() - 1)
+    fake.assert_not_called()
+
+
+def _warm_up(endpoint: str, seconds: float = 0.01) -> None:
+    for _ in range(upstream.LATENCY_MIN_SAMPLES):
+        upstream._latency.record(endpoint, seconds)
+
+
+def _first_then_hedge(first, hedge):
+    """Fake requests.request that runs `first` on the first call, then `hedge`."""
+    calls = []
+    lock = threading.Lock()
+
+    def fake(method, url, timeout, **kwargs):
+        with lock:
+            calls.append(url)
+            n = len(calls)
+        return (first if n == 1 else hedge)()
+
+    return fake
+
+
+def test_hedge_wins_when_first_attempt_is_slow():
+    _warm_up("listing")
+    slow = FakeResponse(200)
+    fast = FakeResponse(200)
+
+    def first():
+        time.sleep(1)
+        return slow
+
+    fake = _first_then_hedge(first, lambda: fast)
+    with mock.patch("requests.request", side_effect=fake) as mocked:
+        start = time.monotonic()
+        assert upstream.request("GET", URL, "listing") is fast
+        elapsed = time.monotonic() - start
+    assert elapsed < 0.5
+    assert mocked.call_count == 2
+
+
+def test_first_attempt_wins_when_hedge_is_slower():
+    _warm_up("listing")
+    first_response = FakeResponse(200)
+
+    def first():
+        time.sleep(0.1)
+        return first_response
+
+    def hedge():
+        time.sleep(1)
+        return FakeResponse(200)
+
+    with mock.patch("requests.request", side_effect=_first_then_hedge(first, hedge)):
+        start = time.monotonic()
+        assert upstream.request("GET", URL, "listing") is first_response
+        assert time.monotonic() - start < 0.5
+
+
+def test_hedge_answers_when_first_attempt_fails():
+    _warm_up("listing")
+
+    def first():
+        time.sleep(0.2)
+        raise requests.ReadTimeout()
+
+    fake = _first_then_hedge(first, lambda: FakeResponse(200))
+
+    with mock.patch("requests.request", side_effect=fake):
+        assert upstream.request("GET", URL, "listing").status_code == 200
+    assert upstream._breaker._failures.get(HOST) is None
+
+
+def test_fast_request_is_not_hedged():
+    _warm_up("listing", seconds=0.1)
+    with mock.patch("requests.request", return_value=FakeResponse(200)) as fake:
+        upstream.request("GET", URL, "listing")
+        time.sleep(0.2)
+    assert fake.call_count == 1
+
+
+def test_failed_hedged_request_counts_one_breaker_failure():
+    _warm_up("listing")
+
+    def fake(method, url, timeout, **kwargs):
+        time.sleep(0.1)
+        raise requests.ReadTimeout()
+
+    with mock.patch("requests.request", side_effect=fake) as mocked:
+        with pytest.raises(upstream.UpstreamUnavailable):
+            upstream.request("GET", URL, "listing")
+    assert mocked.call_count == 2
+    assert upstream._breaker._failures[HOST] == 1
+
+
+def test_hedges_stop_when_budget_is_spent(monkeypatch):
+    _warm_up("listing")
+    monkeypatch.setattr(upstream, "HEDGE_BUDGET_MAX", 1.0)
+    monkeypatch.setattr(upstream, "_budget", upstream._HedgeBudget())
+
+    def fake(method, url, timeout, **kwargs):
+        time.sleep(0.1)
+        return FakeResponse(200)
+
+    with mock.patch("requests.request", side_effect=fake) as mocked:
+        upstream.request("GET", URL, "listing")
+        upstream.request("GET", URL, "listing")
+        time.sleep(0.1)
+    # the first call hedged, the second found the budget empty
+    assert mocked.call_count == 3